@@ -1,21 +1,37 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 
-from app.db.database import get_db
 from app.services.risk_service import RiskService
 
-# Create Risk Service dependency
-def get_risk_service() -> RiskService:
+# Create Risk Service dependency. Dependencies that do no I/O are declared
+# async so FastAPI calls them on the event loop; plain def dependencies are
+# dispatched to the threadpool
+async def get_risk_service() -> RiskService:
     return RiskService()
 
-# Combined dependency for DB and risk service
-def get_db_and_service(
-    db: Session = Depends(get_db),
-    risk_service: RiskService = Depends(get_risk_service)
-) -> tuple[Session, RiskService]:
-    return db, risk_service
+# Keyset pagination cursors: base64 of "<created_at isoformat>:<id>"
+def encode_cursor(created_at: datetime, record_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}:{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+async def get_cursor(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
+) -> Optional[Tuple[datetime, UUID]]:
+    """
+    Decode the pagination cursor into the (created_at, id) of the last row seen.
+    """
+    if cursor is None:
+        return None
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+        return datetime.fromisoformat(created_at), UUID(record_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 # For future authentication implementation
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
@@ -1,120 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from uuid import UUID
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query, Path, Response
+from fastapi_cache import FastAPICache
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Any, Dict, List, Optional, Tuple, get_args
+from uuid import UUID, uuid4
 
+from app.api.deps import encode_cursor, get_cursor
+from app.core.cache import STATISTICS_NAMESPACE
 from app.db.database import get_db
-from app.models.schemas import CustomerBase, CustomerCreate, CustomerWithFeatures, CustomerFeatures
-from app.db.models import Customer, CustomerFeatureRecord, RiskPredictionRecord
+from app.db.queries import mark_latest_predictions_stale, upsert_customer_features
+from app.models.schemas import CustomerBase, CustomerCreate, CustomerWithFeatures, CustomerFeatures, RiskLevel
+from app.db.models import Customer, LatestPrediction, utcnow
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/", response_model=List[CustomerWithFeatures])
-async def list_customers(
-    risk_level: Optional[str] = None,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
-):
+# Features declared as integers; they are stored as floats
+INTEGER_FEATURES = {
+    name for name, field in CustomerFeatures.model_fields.items()
+    if int in get_args(field.annotation)
+}
+
+def _customer_query(risk_level: Optional[RiskLevel] = None):
     """
-    List all customers with optional filtering by risk level.
+    Select customers joined to their latest prediction, loading all features in
+    one extra SELECT ... IN query instead of two queries per customer.
+    
+    With a risk level, only customers whose latest prediction matches are
+    returned, via an inner equi-join on the latest-prediction view.
     """
-    query = db.query(Customer)
+    query = select(Customer, LatestPrediction)
     
-    # Apply risk level filter if provided
     if risk_level:
-        # Subquery to get the latest prediction for each customer
-        latest_predictions = db.query(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.risk_level
-        ).distinct(
-            RiskPredictionRecord.customer_id
-        ).order_by(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.prediction_timestamp.desc()
-        ).subquery()
-        
-        # Filter by risk level
         query = query.join(
-            latest_predictions,
-            Customer.id == latest_predictions.c.customer_id
-        ).filter(
-            latest_predictions.c.risk_level == risk_level
+            LatestPrediction,
+            LatestPrediction.customer_id == Customer.id
+        ).where(
+            LatestPrediction.risk_level == risk_level
+        )
+    else:
+        query = query.outerjoin(
+            LatestPrediction,
+            LatestPrediction.customer_id == Customer.id
         )
     
-    # Apply pagination
-    customers = query.offset(skip).limit(limit).all()
-    
-    # Transform to response model
-    result = []
-    for customer in customers:
-        # Get latest prediction
-        latest_prediction = db.query(RiskPredictionRecord).filter(
-            RiskPredictionRecord.customer_id == customer.id
-        ).order_by(
-            RiskPredictionRecord.prediction_timestamp.desc()
-        ).first()
-        
-        # Get customer features
-        features_records = db.query(CustomerFeatureRecord).filter(
-            CustomerFeatureRecord.customer_id == customer.id
-        ).all()
-        
-        features = {}
-        for feature in features_records:
-            features[feature.feature_name] = feature.feature_value
-        
-        # Create response object
-        customer_data = {
-            "id": customer.id,
-            "name": customer.name,
-            "email": customer.email,
-            "phone": customer.phone,
-            "external_id": customer.external_id,
-            "created_at": customer.created_at,
-            "updated_at": customer.updated_at,
-            "features": features
-        }
-        
-        if latest_prediction:
-            customer_data["risk_level"] = latest_prediction.risk_level
-            customer_data["confidence_score"] = latest_prediction.confidence_score
-            customer_data["last_prediction"] = latest_prediction.prediction_timestamp
-        
-        result.append(customer_data)
-    
-    return result
+    return query.options(
+        selectinload(Customer.features)
+    )
 
-@router.get("/{customer_id}", response_model=CustomerWithFeatures)
-async def get_customer(
-    customer_id: UUID = Path(...),
-    db: Session = Depends(get_db)
-):
+def _serialize_customer(
+    customer: Customer,
+    latest_prediction: Optional[LatestPrediction],
+    features: Dict[str, float]
+) -> Dict[str, Any]:
     """
-    Get a specific customer by ID.
+    Build the response object for a customer from already loaded data.
     """
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
-    # Get latest prediction
-    latest_prediction = db.query(RiskPredictionRecord).filter(
-        RiskPredictionRecord.customer_id == customer.id
-    ).order_by(
-        RiskPredictionRecord.prediction_timestamp.desc()
-    ).first()
-    
-    # Get customer features
-    features_records = db.query(CustomerFeatureRecord).filter(
-        CustomerFeatureRecord.customer_id == customer.id
-    ).all()
-    
-    features = {}
-    for feature in features_records:
-        features[feature.feature_name] = feature.feature_value
-    
-    # Create response object
     customer_data = {
         "id": customer.id,
         "name": customer.name,
@@ -123,7 +66,10 @@ async def get_customer(
         "external_id": customer.external_id,
         "created_at": customer.created_at,
         "updated_at": customer.updated_at,
-        "features": features
+        "features": features,
+        "risk_level": None,
+        "confidence_score": None,
+        "last_prediction": None
     }
     
     if latest_prediction:
@@ -133,11 +79,94 @@ async def get_customer(
     
     return customer_data
 
+def _feature_dict(customer: Customer) -> Dict[str, float]:
+    return {feature.feature_name: feature.feature_value for feature in customer.features}
+
+def _orjson_default(value: Any) -> Any:
+    """
+    Serialize the values orjson doesn't handle natively: asyncpg returns its
+    own UUID subclass, which orjson only accepts as an exact uuid.UUID.
+    """
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError
+
+def _response_features(features: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """
+    Fill in the declared CustomerFeatures fields missing from a customer and
+    cast the integer ones back from their stored floats, so a response
+    serialized without the model has the same shape as one with it.
+    """
+    return {
+        **dict.fromkeys(CustomerFeatures.model_fields),
+        **features,
+        **{name: int(features[name]) for name in INTEGER_FEATURES.intersection(features)}
+    }
+
+@router.get("/", response_model=List[CustomerWithFeatures])
+async def list_customers(
+    risk_level: Optional[RiskLevel] = None,
+    cursor: Optional[Tuple[datetime, UUID]] = Depends(get_cursor),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List all customers with optional filtering by risk level.
+    
+    Customers are returned newest first. When more may follow, the cursor for
+    the next page is sent in the X-Next-Cursor response header.
+    
+    Pages are serialized straight to JSON with orjson; the rows come from the
+    database already in the response shape, so validating each of them against
+    the response model again would only cost CPU on large pages.
+    """
+    query = _customer_query(risk_level)
+    
+    # Apply keyset pagination, resuming after the last customer of the previous page
+    if cursor:
+        query = query.where(tuple_(Customer.created_at, Customer.id) < tuple_(*cursor))
+    
+    result = await db.execute(
+        query.order_by(
+            Customer.created_at.desc(),
+            Customer.id.desc()
+        ).limit(limit)
+    )
+    rows = result.all()
+    
+    content = orjson.dumps([
+        _serialize_customer(customer, latest_prediction, _response_features(_feature_dict(customer)))
+        for customer, latest_prediction in rows
+    ], default=_orjson_default)
+    response = Response(content=content, media_type="application/json")
+    
+    if len(rows) == limit:
+        last_customer = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last_customer.created_at, last_customer.id)
+    
+    return response
+
+@router.get("/{customer_id}", response_model=CustomerWithFeatures)
+async def get_customer(
+    customer_id: UUID = Path(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a specific customer by ID.
+    """
+    result = await db.execute(_customer_query().where(Customer.id == customer_id))
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    customer, latest_prediction = row
+    return _serialize_customer(customer, latest_prediction, _feature_dict(customer))
+
 @router.post("/", response_model=CustomerWithFeatures)
 async def create_customer(
     customer: CustomerCreate,
     features: Optional[CustomerFeatures] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new customer with optional features.
@@ -150,88 +179,116 @@ async def create_customer(
     )
     
     db.add(db_customer)
-    db.commit()
-    db.refresh(db_customer)
+    await db.flush()
     
     # Add features if provided
+    features_dict = {}
     if features:
-        for feature_name, feature_value in features.dict(exclude_unset=True).items():
-            if feature_value is not None:
-                db_feature = CustomerFeatureRecord(
-                    customer_id=db_customer.id,
-                    feature_name=feature_name,
-                    feature_value=float(feature_value)
-                )
-                db.add(db_feature)
-        
-        db.commit()
-    
-    # Return the created customer
-    return await get_customer(db_customer.id, db)
+        features_dict = {
+            name: float(value)
+            for name, value in features.model_dump(exclude_unset=True).items()
+            if value is not None
+        }
+        await upsert_customer_features(db, db_customer.id, features_dict)
+    
+    # A new customer has no predictions yet, so the response is built from
+    # the payload rather than read back from the database
+    customer_data = _serialize_customer(db_customer, None, features_dict)
+    await db.commit()
+    
+    return customer_data
+
+@router.post("/bulk", response_model=List[CustomerWithFeatures])
+async def create_customers_bulk(
+    customers: List[CustomerCreate] = Body(..., max_length=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create several customers at once, in a single INSERT statement.
+    
+    Customers are returned in the order they were sent.
+    """
+    if not customers:
+        return []
+    
+    # RETURNING order isn't guaranteed for a batched insert, and asking
+    # SQLAlchemy to sort it would split the batch into one INSERT per row for
+    # database-generated ids. The ids are assigned here instead, and the rows
+    # are put back in input order by them
+    ids = [uuid4() for _ in customers]
+    
+    # Render None values as NULL instead of leaving the keys out, so rows with
+    # different unset fields still share one statement
+    result = await db.scalars(
+        insert(Customer).returning(Customer).execution_options(render_nulls=True),
+        [{"id": customer_id, **customer.model_dump()} for customer_id, customer in zip(ids, customers)]
+    )
+    customers_by_id = {db_customer.id: db_customer for db_customer in result}
+    db_customers = [customers_by_id[customer_id] for customer_id in ids]
+    
+    customers_data = [_serialize_customer(db_customer, None, {}) for db_customer in db_customers]
+    await db.commit()
+    
+    return customers_data
 
 @router.put("/{customer_id}", response_model=CustomerWithFeatures)
 async def update_customer(
     customer_id: UUID,
     customer_update: CustomerBase,
     features_update: Optional[CustomerFeatures] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a customer's information and/or features.
     """
-    db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not db_customer:
+    result = await db.execute(_customer_query().where(Customer.id == customer_id))
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    db_customer, latest_prediction = row
+    features_dict = _feature_dict(db_customer)
+    
     # Update customer details
-    for key, value in customer_update.dict(exclude_unset=True).items():
+    for key, value in customer_update.model_dump(exclude_unset=True).items():
         setattr(db_customer, key, value)
     
-    db_customer.updated_at = datetime.utcnow()
-    db.commit()
+    # Stamp every applied update, including features-only and no-op ones that
+    # leave no customer column dirty for onupdate to fire on
+    db_customer.updated_at = utcnow()
+    await db.flush()
     
     # Update features if provided
     if features_update:
-        for feature_name, feature_value in features_update.dict(exclude_unset=True).items():
-            if feature_value is not None:
-                # Check if feature exists
-                existing_feature = db.query(CustomerFeatureRecord).filter(
-                    CustomerFeatureRecord.customer_id == customer_id,
-                    CustomerFeatureRecord.feature_name == feature_name
-                ).first()
-                
-                if existing_feature:
-                    existing_feature.feature_value = float(feature_value)
-                    existing_feature.recorded_at = datetime.utcnow()
-                else:
-                    db_feature = CustomerFeatureRecord(
-                        customer_id=customer_id,
-                        feature_name=feature_name,
-                        feature_value=float(feature_value)
-                    )
-                    db.add(db_feature)
-        
-        db.commit()
-    
-    # Return the updated customer
-    return await get_customer(customer_id, db)
+        updated_features = {
+            name: float(value)
+            for name, value in features_update.model_dump(exclude_unset=True).items()
+            if value is not None
+        }
+        await upsert_customer_features(db, customer_id, updated_features)
+        features_dict.update(updated_features)
+    
+    # Build the response from the rows loaded above plus the applied changes
+    customer_data = _serialize_customer(db_customer, latest_prediction, features_dict)
+    await db.commit()
+    
+    return customer_data
 
 @router.delete("/{customer_id}", status_code=204)
 async def delete_customer(
     customer_id: UUID,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a customer and all associated records.
     """
-    db_customer = db.query(Customer).filter(Customer.id == customer_id).first()
-    if not db_customer:
+    # Features, predictions and mitigations are removed by ON DELETE CASCADE
+    result = await db.execute(delete(Customer).where(Customer.id == customer_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Delete associated records
-    db.query(RiskPredictionRecord).filter(RiskPredictionRecord.customer_id == customer_id).delete()
-    db.query(CustomerFeatureRecord).filter(CustomerFeatureRecord.customer_id == customer_id).delete()
+    await db.commit()
     
-    # Delete customer
-    db.delete(db_customer)
-    db.commit()
\ No newline at end of file
+    mark_latest_predictions_stale()
+    background_tasks.add_task(FastAPICache.clear, namespace=STATISTICS_NAMESPACE)
\ No newline at end of file
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Path
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from uuid import UUID
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, Response
+from sqlalchemy import insert, literal, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime
 
+from app.api.deps import encode_cursor, get_cursor
 from app.db.database import get_db
-from app.models.schemas import MitigationCreate, Mitigation
+from app.models.schemas import MitigationCreate, Mitigation, MitigationStatus
 from app.db.models import MitigationRecord, Customer, RiskPredictionRecord
 
 router = APIRouter()
@@ -13,44 +15,57 @@ router = APIRouter()
 @router.post("/", response_model=Mitigation)
 async def create_mitigation(
     mitigation: MitigationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Apply a mitigation measure to a high-risk customer.
     """
     try:
-        # Check if customer exists
-        customer = db.query(Customer).filter(Customer.id == mitigation.customer_id).first()
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        
-        # Verify customer is high-risk
-        latest_prediction = db.query(RiskPredictionRecord).filter(
+        # Insert the mitigation only if the customer's latest prediction is
+        # High, checked and written in one statement so the two can't race
+        latest_prediction_id = select(
+            RiskPredictionRecord.id
+        ).where(
             RiskPredictionRecord.customer_id == mitigation.customer_id
         ).order_by(
             RiskPredictionRecord.prediction_timestamp.desc()
-        ).first()
+        ).limit(1).scalar_subquery()
+        
+        values = {
+            "id": uuid4(),
+            "customer_id": mitigation.customer_id,
+            "risk_level": mitigation.risk_level,
+            "mitigation_type": mitigation.mitigation_type,
+            "description": mitigation.description,
+            "assigned_to": mitigation.assigned_to,
+            "due_date": mitigation.due_date,
+            "created_at": datetime.utcnow(),
+            "status": "Pending"
+        }
+        columns = [getattr(MitigationRecord, name) for name in values]
+        
+        db_mitigation = await db.scalar(
+            insert(MitigationRecord).from_select(
+                list(values),
+                select(*[
+                    literal(value, column.type) for value, column in zip(values.values(), columns)
+                ]).where(
+                    RiskPredictionRecord.id == latest_prediction_id,
+                    RiskPredictionRecord.risk_level == "High"
+                )
+            ).returning(MitigationRecord)
+        )
         
-        if not latest_prediction or latest_prediction.risk_level != "High":
+        if not db_mitigation:
+            # Nothing was inserted; report why
+            if not await db.get(Customer, mitigation.customer_id):
+                raise HTTPException(status_code=404, detail="Customer not found")
             raise HTTPException(
                 status_code=400, 
                 detail="Mitigations can only be applied to high-risk customers"
             )
         
-        # Create mitigation record
-        db_mitigation = MitigationRecord(
-            customer_id=mitigation.customer_id,
-            risk_level=mitigation.risk_level,
-            mitigation_type=mitigation.mitigation_type,
-            description=mitigation.description,
-            assigned_to=mitigation.assigned_to,
-            due_date=mitigation.due_date,
-            status="Pending"
-        )
-        
-        db.add(db_mitigation)
-        db.commit()
-        db.refresh(db_mitigation)
+        await db.commit()
         
         return db_mitigation
     except HTTPException:
@@ -60,29 +75,46 @@ async def create_mitigation(
 
 @router.get("/", response_model=List[Mitigation])
 async def list_mitigations(
+    response: Response,
     customer_id: Optional[UUID] = None,
-    status: Optional[str] = None,
-    skip: int = Query(0, ge=0),
+    status: Optional[MitigationStatus] = None,
+    cursor: Optional[Tuple[datetime, UUID]] = Depends(get_cursor),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     List mitigation measures with optional filtering.
+    
+    Mitigations are returned newest first. When more may follow, the cursor
+    for the next page is sent in the X-Next-Cursor response header.
     """
     try:
-        query = db.query(MitigationRecord)
+        query = select(MitigationRecord)
         
         # Apply filters
         if customer_id:
-            query = query.filter(MitigationRecord.customer_id == customer_id)
+            query = query.where(MitigationRecord.customer_id == customer_id)
         
         if status:
-            query = query.filter(MitigationRecord.status == status)
+            query = query.where(MitigationRecord.status == status)
         
-        # Apply pagination
-        mitigations = query.order_by(
-            MitigationRecord.created_at.desc()
-        ).offset(skip).limit(limit).all()
+        # Apply keyset pagination, resuming after the last mitigation of the previous page
+        if cursor:
+            query = query.where(
+                tuple_(MitigationRecord.created_at, MitigationRecord.id) < tuple_(*cursor)
+            )
+        
+        result = await db.scalars(
+            query.order_by(
+                MitigationRecord.created_at.desc(),
+                MitigationRecord.id.desc()
+            ).limit(limit)
+        )
+        mitigations = result.all()
+        
+        if len(mitigations) == limit:
+            last_mitigation = mitigations[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(last_mitigation.created_at, last_mitigation.id)
         
         return mitigations
     except Exception as e:
@@ -91,12 +123,12 @@ async def list_mitigations(
 @router.get("/{mitigation_id}", response_model=Mitigation)
 async def get_mitigation(
     mitigation_id: UUID = Path(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get details of a specific mitigation measure.
     """
-    mitigation = db.query(MitigationRecord).filter(MitigationRecord.id == mitigation_id).first()
+    mitigation = await db.get(MitigationRecord, mitigation_id)
     if not mitigation:
         raise HTTPException(status_code=404, detail="Mitigation not found")
     
@@ -105,28 +137,23 @@ async def get_mitigation(
 @router.put("/{mitigation_id}/status", response_model=Mitigation)
 async def update_mitigation_status(
     mitigation_id: UUID = Path(...),
-    status: str = Query(..., description="New status - Pending, In Progress, Completed, Cancelled"),
-    db: Session = Depends(get_db)
+    status: MitigationStatus = Query(..., description="New status - Pending, In Progress, Completed, Cancelled"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update the status of a mitigation measure.
     """
-    valid_statuses = ["Pending", "In Progress", "Completed", "Cancelled"]
-    if status not in valid_statuses:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
-        )
-    
-    mitigation = db.query(MitigationRecord).filter(MitigationRecord.id == mitigation_id).first()
+    # Update in place and read the new row back in the same statement
+    mitigation = await db.scalar(
+        update(MitigationRecord).where(
+            MitigationRecord.id == mitigation_id
+        ).values(
+            status=status
+        ).returning(MitigationRecord)
+    )
     if not mitigation:
         raise HTTPException(status_code=404, detail="Mitigation not found")
     
-    mitigation.status = status
-    mitigation.updated_at = datetime.utcnow()
-    
-    db.add(mitigation)
-    db.commit()
-    db.refresh(mitigation)
+    await db.commit()
     
     return mitigation
\ No newline at end of file
@@ -1,69 +1,147 @@
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, HTTPException, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi_cache import FastAPICache
+from fastapi_cache.decorator import cache
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
+from app.core.cache import STATISTICS_NAMESPACE, no_db_session_key_builder
 from app.db.database import get_db
-from app.models.schemas import RiskPredictionCreate, RiskPrediction, RiskDistribution
+from app.db.queries import mark_latest_predictions_stale
+from app.models.schemas import RiskPredictionCreate, RiskPrediction, RiskDistribution, PredictionCacheStats
 from app.models.ml_model import risk_model
-from app.db.models import Customer, RiskPredictionRecord
+from app.db.models import Customer, RiskPredictionRecord, LatestPrediction
 
 router = APIRouter()
 
 @router.post("/predict", response_model=RiskPrediction)
 async def predict_customer_risk(
     prediction_data: RiskPredictionCreate,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Predict risk level for a customer based on their features.
     """
     try:
-        # Check if customer exists
-        customer = db.query(Customer).filter(Customer.id == prediction_data.customer_id).first()
-        if not customer:
+        # Make prediction in a worker thread; model inference is CPU-bound
+        prediction_result = await run_in_threadpool(
+            risk_model.predict,
+            prediction_data.customer_features.model_dump(exclude_unset=True)
+        )
+        
+        # Save prediction to database, reading the stored row back with RETURNING.
+        # The customer foreign key rejects unknown customers, so no lookup is needed
+        try:
+            db_prediction = await db.scalar(
+                insert(RiskPredictionRecord).values(
+                    customer_id=prediction_data.customer_id,
+                    risk_level=prediction_result["risk_level"],
+                    confidence_score=prediction_result.get("confidence_score")
+                ).returning(RiskPredictionRecord)
+            )
+        except IntegrityError:
+            await db.rollback()
             raise HTTPException(status_code=404, detail="Customer not found")
+        await db.commit()
         
-        # Make prediction
-        prediction_result = risk_model.predict(prediction_data.customer_features.dict())
+        # Have the latest-prediction view rebuilt on its next periodic refresh,
+        # and drop cached statistics without delaying the response
+        mark_latest_predictions_stale()
+        background_tasks.add_task(FastAPICache.clear, namespace=STATISTICS_NAMESPACE)
         
-        # Save prediction to database
-        db_prediction = RiskPredictionRecord(
-            customer_id=prediction_data.customer_id,
-            risk_level=prediction_result["risk_level"],
-            confidence_score=prediction_result.get("confidence_score")
+        return db_prediction
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+@router.post("/predict/batch", response_model=List[RiskPrediction])
+async def predict_customers_risk_batch(
+    background_tasks: BackgroundTasks,
+    predictions_data: List[RiskPredictionCreate] = Body(..., max_length=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Predict risk levels for several customers with a single model call.
+    """
+    if not predictions_data:
+        return []
+    
+    try:
+        # Check that all customers exist with one query
+        customer_ids = {prediction_data.customer_id for prediction_data in predictions_data}
+        found_ids = set(
+            await db.scalars(select(Customer.id).where(Customer.id.in_(customer_ids)))
         )
-        db.add(db_prediction)
-        db.commit()
-        db.refresh(db_prediction)
+        missing_ids = customer_ids - found_ids
+        if missing_ids:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Customers not found: {', '.join(str(customer_id) for customer_id in missing_ids)}"
+            )
         
-        return db_prediction
+        # Make predictions
+        prediction_results = await run_in_threadpool(
+            risk_model.predict_batch,
+            [prediction_data.customer_features.model_dump(exclude_unset=True) for prediction_data in predictions_data]
+        )
+        
+        # Save predictions to database with one multi-row INSERT ... RETURNING,
+        # rows coming back in input order
+        db_predictions = await db.scalars(
+            insert(RiskPredictionRecord).returning(RiskPredictionRecord, sort_by_parameter_order=True),
+            [
+                {
+                    "customer_id": prediction_data.customer_id,
+                    "risk_level": prediction_result["risk_level"],
+                    "confidence_score": prediction_result.get("confidence_score")
+                }
+                for prediction_data, prediction_result in zip(predictions_data, prediction_results)
+            ]
+        )
+        
+        # Serialize before committing so the response needs no reload per row
+        result = [RiskPrediction.model_validate(db_prediction) for db_prediction in db_predictions]
+        await db.commit()
+        
+        mark_latest_predictions_stale()
+        background_tasks.add_task(FastAPICache.clear, namespace=STATISTICS_NAMESPACE)
+        
+        return result
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 @router.get("/statistics", response_model=RiskDistribution)
-async def get_risk_distribution(db: Session = Depends(get_db)):
+@cache(expire=30, namespace=STATISTICS_NAMESPACE, key_builder=no_db_session_key_builder)
+async def get_risk_distribution(db: AsyncSession = Depends(get_db)):
     """
     Get distribution of customers across risk categories.
     """
     try:
-        # Get the latest risk level for each customer
-        subquery = db.query(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.risk_level
-        ).distinct(
-            RiskPredictionRecord.customer_id
-        ).order_by(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.prediction_timestamp.desc()
-        ).subquery()
+        # Count customers by their latest risk level in a single aggregate query
+        result = await db.execute(
+            select(
+                LatestPrediction.risk_level,
+                func.count()
+            ).group_by(
+                LatestPrediction.risk_level
+            )
+        )
+        counts = dict(result.all())
         
-        # Count customers in each risk category
-        low_risk = db.query(subquery).filter(subquery.c.risk_level == "Low").count()
-        medium_risk = db.query(subquery).filter(subquery.c.risk_level == "Medium").count()
-        high_risk = db.query(subquery).filter(subquery.c.risk_level == "High").count()
+        low_risk = counts.get("Low", 0)
+        medium_risk = counts.get("Medium", 0)
+        high_risk = counts.get("High", 0)
         
         total_customers = low_risk + medium_risk + high_risk
         
@@ -74,4 +152,11 @@ async def get_risk_distribution(db: Session = Depends(get_db)):
             "total_customers": total_customers
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve risk statistics: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve risk statistics: {str(e)}")
+
+@router.get("/cache-stats", response_model=PredictionCacheStats)
+async def get_prediction_cache_stats():
+    """
+    Get hit and size statistics of the model's prediction cache.
+    """
+    return risk_model.cache_info()
\ No newline at end of file
@@ -0,0 +1,39 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+
+# Namespace of the cached /predictions/statistics response
+STATISTICS_NAMESPACE = "statistics"
+
+def init_cache() -> None:
+    """Set up the response cache backend: Redis if configured, memory otherwise."""
+    if settings.REDIS_URL:
+        backend = RedisBackend(aioredis.from_url(settings.REDIS_URL))
+    else:
+        backend = InMemoryBackend()
+    
+    FastAPICache.init(backend, prefix="risk")
+
+def no_db_session_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Tuple[Any, ...] = (),
+    kwargs: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Build a cache key from the endpoint and its query string.
+    
+    The default key builder hashes every argument, including the per-request
+    database session, so it would never produce a cache hit.
+    """
+    query = request.url.query if request else ""
+    return f"{namespace}:{func.__module__}:{func.__name__}:{query}"
@@ -1,6 +1,6 @@
 import os
-from typing import List
-from pydantic_settings import BaseSettings
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     # API settings
@@ -12,14 +12,22 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Seconds between refreshes of the latest-prediction view after writes
+    LATEST_PREDICTION_REFRESH_INTERVAL: float = float(os.getenv("LATEST_PREDICTION_REFRESH_INTERVAL", "5"))
     
     # ML model settings
     MODEL_PATH: str = os.getenv("MODEL_PATH", "./data/risk_model.pkl")
+    PREDICTION_CACHE_SIZE: int = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+    
+    # Cache settings (falls back to an in-process cache when unset)
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
     
     # Data path
     DATA_DIR: str = os.getenv("DATA_DIR", "./data")
     
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
\ No newline at end of file
@@ -1,21 +1,67 @@
-from sqlalchemy import create_engine
+from typing import AsyncGenerator
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-)
+# asyncio driver used by the API for each supported backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+database_url = make_url(settings.DATABASE_URL)
+connect_args = {"check_same_thread": False} if database_url.get_backend_name() == "sqlite" else {}
+
+# Synchronous engine for scripts (init_db.py, seed_db.py). A sync driver named
+# in the URL is kept; an asyncio one falls back to the backend's default driver
+sync_database_url = database_url
+if database_url.drivername in ASYNC_DRIVERS.values():
+    sync_database_url = database_url.set(drivername=database_url.get_backend_name())
+
+engine = create_engine(sync_database_url, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# asyncpg keeps a per-connection cache of server-side prepared statements;
+# size it to hold every distinct statement the API issues
+async_connect_args = dict(connect_args)
+if database_url.get_backend_name() == "postgresql":
+    async_connect_args["prepared_statement_cache_size"] = 1024
+
+# Asynchronous engine for the API, so queries don't block the event loop.
+# The pool is sized so concurrent requests don't queue for a connection, and
+# the compiled SQL cache holds every statement the API builds
+async_engine = create_async_engine(
+    database_url.set(drivername=ASYNC_DRIVERS[database_url.get_backend_name()]),
+    connect_args=async_connect_args,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    query_cache_size=1200
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# SQLite only enforces foreign keys, and so ON DELETE CASCADE, when enabled
+# on each connection
+if database_url.get_backend_name() == "sqlite":
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,50 +1,106 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint, text, DDL, event
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import FunctionElement
 import uuid
 from datetime import datetime
+from typing import get_args
 
 from app.db.database import Base
+from app.models.schemas import MitigationStatus, MitigationType, RiskLevel
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time evaluated by the database, matching the naive UTC
+    timestamps written from Python elsewhere in the models.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+class gen_random_uuid(FunctionElement):
+    """
+    Random UUID generated by the database, so bulk inserts don't need an id
+    computed in Python for every row.
+    
+    SQLite has no UUID function; it gets 16 random bytes as the 32 hex digits
+    the UUID type stores there.
+    """
+    type = UUID(as_uuid=True)
+    inherit_cache = True
+
+@compiles(gen_random_uuid)
+def _default_gen_random_uuid(element, compiler, **kw):
+    return "lower(hex(randomblob(16)))"
+
+@compiles(gen_random_uuid, "postgresql")
+def _pg_gen_random_uuid(element, compiler, **kw):
+    return "gen_random_uuid()"
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        # Keyset pagination order of list_customers
+        Index("ix_customers_created_id", text("created_at DESC"), text("id DESC")),
+    )
+    # Read server-generated updated_at back in the UPDATE itself
+    __mapper_args__ = {"eager_defaults": True}
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=gen_random_uuid())
     external_id = Column(String, index=True, nullable=True)
     name = Column(String, nullable=False)
     email = Column(String, nullable=True)
     phone = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True, onupdate=utcnow())
     
     # Relationships
-    predictions = relationship("RiskPredictionRecord", back_populates="customer")
-    mitigations = relationship("MitigationRecord", back_populates="customer")
+    # Child rows are removed by the ON DELETE CASCADE foreign keys, so the ORM
+    # doesn't load them just to delete them
+    features = relationship("CustomerFeatureRecord", back_populates="customer", lazy="select", passive_deletes=True)
+    predictions = relationship("RiskPredictionRecord", back_populates="customer", passive_deletes=True)
+    mitigations = relationship("MitigationRecord", back_populates="customer", passive_deletes=True)
     
     def __repr__(self):
         return f"<Customer {self.name}>"
 
 class CustomerFeatureRecord(Base):
     __tablename__ = "customer_features"
+    __table_args__ = (
+        # One current value per feature; lets writes upsert on conflict
+        UniqueConstraint("customer_id", "feature_name", name="uq_customer_features_customer_feature"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
     feature_name = Column(String, nullable=False)
     feature_value = Column(Float, nullable=False)
     recorded_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    customer = relationship("Customer")
+    customer = relationship("Customer", back_populates="features")
     
     def __repr__(self):
         return f"<CustomerFeature {self.feature_name}={self.feature_value}>"
 
 class RiskPredictionRecord(Base):
     __tablename__ = "risk_predictions"
+    __table_args__ = (
+        # Serves "latest prediction per customer" lookups without a sort
+        Index("ix_risk_predictions_customer_ts", "customer_id", text("prediction_timestamp DESC")),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
-    risk_level = Column(String, nullable=False)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    risk_level = Column(Enum(*get_args(RiskLevel), name="risk_level_enum"), nullable=False)
     confidence_score = Column(Float, nullable=True)
     prediction_timestamp = Column(DateTime, default=datetime.utcnow)
     
@@ -56,18 +112,25 @@ class RiskPredictionRecord(Base):
 
 class MitigationRecord(Base):
     __tablename__ = "mitigations"
+    __table_args__ = (
+        # Keyset pagination order of list_mitigations, unfiltered and filtered
+        Index("ix_mitigations_created_id", text("created_at DESC"), text("id DESC")),
+        Index("ix_mitigations_status_created", "status", text("created_at DESC"), text("id DESC")),
+        Index("ix_mitigations_customer_created", "customer_id", text("created_at DESC"), text("id DESC")),
+    )
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
-    risk_level = Column(String, nullable=False)
-    mitigation_type = Column(String, nullable=False)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    risk_level = Column(Enum(*get_args(RiskLevel), name="risk_level_enum"), nullable=False)
+    mitigation_type = Column(Enum(*get_args(MitigationType), name="mitigation_type_enum"), nullable=False)
     description = Column(Text, nullable=False)
     assigned_to = Column(String, nullable=True)
     due_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True, onupdate=utcnow())
     status = Column(
-        String,
+        Enum(*get_args(MitigationStatus), name="mitigation_status_enum"),
         default="Pending",
         nullable=False
     )
@@ -76,4 +139,62 @@ class MitigationRecord(Base):
     customer = relationship("Customer", back_populates="mitigations")
     
     def __repr__(self):
-        return f"<Mitigation {self.mitigation_type} for {self.customer_id}>"
\ No newline at end of file
+        return f"<Mitigation {self.mitigation_type} for {self.customer_id}>"
+
+class LatestPrediction(Base):
+    """
+    Read-only mapping of the mv_latest_prediction view: one row holding the
+    latest prediction for each customer.
+    """
+    __tablename__ = "mv_latest_prediction"
+    __table_args__ = {"info": {"is_view": True}}
+    
+    customer_id = Column(UUID(as_uuid=True), primary_key=True)
+    # The view inherits the native enum type of risk_predictions.risk_level
+    risk_level = Column(Enum(*get_args(RiskLevel), name="risk_level_enum", create_type=False), nullable=False)
+    confidence_score = Column(Float, nullable=True)
+    prediction_timestamp = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<LatestPrediction {self.customer_id}: {self.risk_level}>"
+
+# The view is created alongside the tables. PostgreSQL gets a materialized view
+# with the unique index REFRESH ... CONCURRENTLY needs; SQLite a plain view.
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE MATERIALIZED VIEW IF NOT EXISTS mv_latest_prediction AS "
+        "SELECT DISTINCT ON (customer_id) customer_id, risk_level, confidence_score, prediction_timestamp "
+        "FROM risk_predictions "
+        "ORDER BY customer_id, prediction_timestamp DESC"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_latest_prediction_customer_id "
+        "ON mv_latest_prediction (customer_id)"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_mv_latest_prediction_risk_level "
+        "ON mv_latest_prediction (risk_level)"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIEW IF NOT EXISTS mv_latest_prediction AS "
+        "SELECT customer_id, risk_level, confidence_score, prediction_timestamp FROM ("
+        "SELECT customer_id, risk_level, confidence_score, prediction_timestamp, "
+        "ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY prediction_timestamp DESC) AS rn "
+        "FROM risk_predictions"
+        ") ranked WHERE rn = 1"
+    ).execute_if(dialect="sqlite")
+)
\ No newline at end of file
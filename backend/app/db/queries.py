@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import async_engine
+from app.db.models import CustomerFeatureRecord, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Set by prediction writes, cleared by the periodic refresh
+_latest_predictions_stale = False
+
+async def upsert_customer_features(db: AsyncSession, customer_id: UUID, features: Dict[str, Any]) -> None:
+    """
+    Insert or update a customer's features in a single INSERT ... ON CONFLICT
+    statement, keyed on (customer_id, feature_name). None values are skipped.
+    """
+    rows = [
+        {"customer_id": customer_id, "feature_name": name, "feature_value": float(value)}
+        for name, value in features.items()
+        if value is not None
+    ]
+    if not rows:
+        return
+    
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(CustomerFeatureRecord).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["customer_id", "feature_name"],
+        set_={
+            "feature_value": stmt.excluded.feature_value,
+            "recorded_at": utcnow()
+        }
+    )
+    await db.execute(stmt)
+
+def mark_latest_predictions_stale() -> None:
+    """
+    Record that predictions changed, so the next periodic refresh rebuilds the
+    mv_latest_prediction view. Writes call this instead of refreshing the view
+    themselves, which would recompute it in full for every single write.
+    """
+    global _latest_predictions_stale
+    _latest_predictions_stale = True
+
+async def refresh_latest_predictions_periodically(
+    interval: float,
+    after_refresh: Optional[Callable[[], Awaitable[Any]]] = None
+) -> None:
+    """
+    Refresh the mv_latest_prediction view every interval seconds while it is
+    marked stale, so any number of writes in between cost one refresh.
+    
+    On SQLite the view is always current and the refresh does nothing, but
+    after_refresh still runs once the predictions have changed.
+    
+    Args:
+        interval: Seconds between checks
+        after_refresh: Called after each refresh, e.g. to drop cached results
+            computed from the old view
+    """
+    global _latest_predictions_stale
+    while True:
+        await asyncio.sleep(interval)
+        if not _latest_predictions_stale:
+            continue
+        
+        _latest_predictions_stale = False
+        try:
+            await refresh_latest_predictions()
+            if after_refresh:
+                await after_refresh()
+        except Exception:
+            # Try again on the next tick
+            _latest_predictions_stale = True
+            logger.exception("Failed to refresh mv_latest_prediction")
+
+async def refresh_latest_predictions() -> None:
+    """
+    Refresh the mv_latest_prediction materialized view.
+    
+    Only PostgreSQL materializes the view; on SQLite it is a plain view that is
+    always current, so there is nothing to do.
+    """
+    if async_engine.dialect.name != "postgresql":
+        return
+    
+    async with async_engine.begin() as connection:
+        await connection.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_latest_prediction"))
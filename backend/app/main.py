@@ -1,12 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi_cache import FastAPICache
 from app.api.endpoints import customers, predictions, mitigations
+from app.core.cache import STATISTICS_NAMESPACE, init_cache
 from app.core.config import settings
+from app.db.queries import refresh_latest_predictions_periodically
+from app.services.risk_service import RiskService
+
+async def clear_statistics_caches() -> None:
+    """Drop every cached result computed from the latest-prediction view."""
+    RiskService.clear_risk_distribution_cache()
+    await FastAPICache.clear(namespace=STATISTICS_NAMESPACE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_cache()
+    # Cached statistics are read from the view, so drop them once it is rebuilt
+    refresh_task = asyncio.create_task(refresh_latest_predictions_periodically(
+        settings.LATEST_PREDICTION_REFRESH_INTERVAL,
+        after_refresh=clear_statistics_caches
+    ))
+    yield
+    refresh_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await refresh_task
 
 app = FastAPI(
     title="Customer Risk Prediction API",
     description="API for predicting and managing customer risk levels",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -16,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
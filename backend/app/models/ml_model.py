@@ -1,40 +1,92 @@
-import pickle
 import os
+import joblib
 import numpy as np
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 class RiskModel:
+    # Feature order assumed when the saved model does not list its features
+    DEFAULT_FEATURES = (
+        "age", "income", "credit_score", "account_balance",
+        "num_transactions", "transaction_frequency", "average_transaction_amount"
+    )
+    
     def __init__(self):
         self.model = None
+        self.session = None
         self.features = None
+        self._feature_order = self.DEFAULT_FEATURES
+        self._feature_dtype = np.float64
+        self._predict_cached = lru_cache(maxsize=settings.PREDICTION_CACHE_SIZE)(self._predict_features)
         self._load_model()
     
     def _load_model(self) -> None:
-        """Loads the pickled ML model."""
+        """
+        Loads the ML model saved with joblib.dump, or an ONNX export of it.
+        
+        NumPy arrays in the model are memory-mapped read-only, so workers forked
+        after loading (gunicorn --preload) share one copy through the page cache.
+        The file must be saved uncompressed for its arrays to be mappable.
+        """
+        if settings.MODEL_PATH.endswith('.onnx'):
+            self._load_onnx_model()
+            return
+        
         try:
-            with open(settings.MODEL_PATH, 'rb') as f:
-                model_data = pickle.load(f)
-                
-                # Depending on how the model was saved, you might need to adjust this
-                # If the pickle contains just the model
-                if hasattr(model_data, 'predict'):
-                    self.model = model_data
-                # If the pickle contains both model and feature names
-                elif isinstance(model_data, dict) and 'model' in model_data:
-                    self.model = model_data['model']
-                    self.features = model_data.get('features')
-                else:
-                    self.model = model_data
-                    
+            model_data = joblib.load(settings.MODEL_PATH, mmap_mode='r')
+            
+            # Depending on how the model was saved, you might need to adjust this
+            # If the pickle contains just the model
+            if hasattr(model_data, 'predict'):
+                self.model = model_data
+            # If the pickle contains both model and feature names
+            elif isinstance(model_data, dict) and 'model' in model_data:
+                self.model = model_data['model']
+                self.features = model_data.get('features')
+            else:
+                self.model = model_data
+            
+            # Fix the input layout once instead of working it out per request
+            self._feature_order = tuple(self.features) if self.features else self.DEFAULT_FEATURES
+            # Tree ensembles convert input to float32 internally, so build it
+            # that way; other estimators keep float64 to match their fitted data
+            is_tree_model = hasattr(self.model, 'tree_') or hasattr(self.model, 'estimators_')
+            self._feature_dtype = np.float32 if is_tree_model else np.float64
+            
             logger.info(f"Successfully loaded risk prediction model from {settings.MODEL_PATH}")
         except Exception as e:
             logger.error(f"Failed to load model: {str(e)}")
             raise RuntimeError(f"Failed to load risk prediction model: {str(e)}")
     
+    def _load_onnx_model(self) -> None:
+        """
+        Loads a model exported by convert_model.py into an ONNX Runtime session.
+        
+        ONNX Runtime evaluates the model with vectorized float32 kernels, which
+        is faster than the scikit-learn estimator for single rows and batches.
+        """
+        try:
+            import onnxruntime as ort
+            
+            self.session = ort.InferenceSession(settings.MODEL_PATH, providers=["CPUExecutionProvider"])
+            self._onnx_input = self.session.get_inputs()[0].name
+            self._onnx_outputs = [output.name for output in self.session.get_outputs()]
+            
+            # convert_model.py records the feature order in the model metadata
+            features = self.session.get_modelmeta().custom_metadata_map.get('features')
+            self.features = features.split(',') if features else None
+            self._feature_order = tuple(self.features) if self.features else self.DEFAULT_FEATURES
+            self._feature_dtype = np.float32
+            
+            logger.info(f"Successfully loaded ONNX risk prediction model from {settings.MODEL_PATH}")
+        except Exception as e:
+            logger.error(f"Failed to load model: {str(e)}")
+            raise RuntimeError(f"Failed to load risk prediction model: {str(e)}")
+    
     def predict(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Predict risk level for a customer based on their data.
@@ -45,77 +97,118 @@ class RiskModel:
         Returns:
             Dictionary with risk level and confidence score
         """
+        # Features are rounded to 2 decimal places so that near-identical
+        # customers share a cached prediction instead of each running the model
+        key = tuple(
+            None if (value := customer_data.get(feature)) is None else round(float(value), 2)
+            for feature in self._feature_order
+        )
+        return dict(self._predict_cached(key))
+    
+    def _predict_features(self, key: Tuple[Optional[float], ...]) -> Dict[str, Any]:
+        return self.predict_batch([dict(zip(self._feature_order, key))])[0]
+    
+    def cache_info(self) -> Dict[str, int]:
+        """
+        Get hit and size statistics of the prediction cache.
+        
+        Returns:
+            Dictionary with cache hits, misses, maximum and current size
+        """
+        info = self._predict_cached.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "maxsize": info.maxsize,
+            "currsize": info.currsize
+        }
+    
+    def predict_batch(self, customers_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Predict risk levels for several customers with a single model call.
+        
+        Args:
+            customers_data: List of dictionaries containing customer features
+            
+        Returns:
+            List of dictionaries with risk level and confidence score, in input order
+        """
+        if not customers_data:
+            return []
+        
         try:
-            if self.model is None:
+            if self.model is None and self.session is None:
                 self._load_model()
                 
-            # Transform customer data into feature array
-            features_array = self._preprocess_features(customer_data)
-            
-            # Make prediction
-            prediction_result = self.model.predict(features_array)[0]
+            # Pack all customers into one (n_customers, n_features) array
+            features_array = self._preprocess_features(customers_data)
             
-            # Get prediction probabilities if available
-            confidence_score = None
-            if hasattr(self.model, 'predict_proba'):
-                probabilities = self.model.predict_proba(features_array)[0]
-                confidence_score = float(max(probabilities))
+            if self.session is not None:
+                outputs = dict(zip(
+                    self._onnx_outputs,
+                    self.session.run(None, {self._onnx_input: features_array})
+                ))
+                predictions = outputs['label']
+                probabilities = outputs.get('probabilities')
+                if probabilities is not None:
+                    confidence_scores = probabilities.max(axis=1).tolist()
+                else:
+                    confidence_scores = [None] * len(predictions)
+            # predict_proba already determines the predicted class, so a
+            # separate predict call is only needed for models without it
+            elif hasattr(self.model, 'predict_proba'):
+                probabilities = self.model.predict_proba(features_array)
+                best = probabilities.argmax(axis=1)
+                classes = getattr(self.model, 'classes_', None)
+                predictions = classes[best] if classes is not None else best
+                confidence_scores = probabilities.max(axis=1).tolist()
+            else:
+                predictions = self.model.predict(features_array)
+                confidence_scores = [None] * len(predictions)
             
             # Map prediction to risk level
             risk_levels = {0: "Low", 1: "Medium", 2: "High"}
-            risk_level = risk_levels.get(prediction_result, "Unknown")
             
-            return {
-                "risk_level": risk_level,
-                "confidence_score": confidence_score,
-                "prediction": int(prediction_result)
-            }
+            return [
+                {
+                    "risk_level": risk_levels.get(prediction_result, "Unknown"),
+                    "confidence_score": confidence_score,
+                    "prediction": int(prediction_result)
+                }
+                for prediction_result, confidence_score in zip(np.asarray(predictions).tolist(), confidence_scores)
+            ]
             
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
             raise ValueError(f"Failed to generate prediction: {str(e)}")
     
-    def _preprocess_features(self, customer_data: Dict[str, Any]) -> np.ndarray:
+    def _preprocess_features(self, customers_data: List[Dict[str, Any]]) -> np.ndarray:
         """
         Preprocess customer data into feature array for model input.
         
         Args:
-            customer_data: Raw customer data
+            customers_data: Raw data of each customer
             
         Returns:
-            NumPy array of features in the format expected by the model
+            NumPy array of features, one row per customer, in the format
+            expected by the model
         """
-        # Extract required features in the correct order
-        # This will need to be customized based on your model's expected input
-        
         if self.features:
-            # If we have feature names, use them to order the features
-            feature_values = []
-            for feature in self.features:
-                if feature in customer_data:
-                    feature_values.append(customer_data[feature])
-                else:
-                    # Handle missing features
-                    logger.warning(f"Missing feature: {feature}")
-                    feature_values.append(0)  # Default value or imputation
-            
-            return np.array([feature_values])
-        else:
-            # If we don't have feature names, make assumptions based on the data
-            # This is just an example and should be adapted to your specific model
-            feature_keys = [
-                "age", "income", "credit_score", "account_balance",
-                "num_transactions", "transaction_frequency", "average_transaction_amount"
+            for feature in self._feature_order:
+                missing = sum(customer_data.get(feature) is None for customer_data in customers_data)
+                if missing:
+                    logger.warning(f"Missing feature: {feature} ({missing} of {len(customers_data)} customers)")
+        
+        # Build plain rows in the precomputed feature order and convert them in
+        # one call; missing features take the default value of 0
+        rows = [
+            [
+                0 if (value := customer_data.get(feature)) is None else value
+                for feature in self._feature_order
             ]
-            
-            feature_values = []
-            for key in feature_keys:
-                if key in customer_data:
-                    feature_values.append(customer_data[key])
-                else:
-                    feature_values.append(0)  # Default value
-            
-            return np.array([feature_values])
+            for customer_data in customers_data
+        ]
+        return np.array(rows, dtype=self._feature_dtype).reshape(len(customers_data), len(self._feature_order))
 
 # Create a singleton instance
 risk_model = RiskModel()
\ No newline at end of file
@@ -1,8 +1,13 @@
-from pydantic import BaseModel, Field, validator
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+from typing import Dict, List, Literal, Optional, Any
+from datetime import datetime, timezone
 from uuid import UUID, uuid4
 
+# Allowed values, validated by pydantic-core and stored as enums in the database
+RiskLevel = Literal["Low", "Medium", "High"]
+MitigationType = Literal["Flag", "Note", "Action", "Monitor"]
+MitigationStatus = Literal["Pending", "In Progress", "Completed", "Cancelled"]
+
 # Customer Schemas
 class CustomerBase(BaseModel):
     name: str
@@ -21,8 +26,7 @@ class CustomerFeatures(BaseModel):
     transaction_frequency: Optional[float] = None
     average_transaction_amount: Optional[float] = None
     
-    class Config:
-        extra = "allow"  # Allow additional fields
+    model_config = ConfigDict(extra="allow")  # Allow additional fields
         
 class CustomerWithFeatures(CustomerBase):
     id: UUID
@@ -30,9 +34,11 @@ class CustomerWithFeatures(CustomerBase):
     features: CustomerFeatures
     created_at: datetime
     updated_at: Optional[datetime] = None
+    risk_level: Optional[RiskLevel] = None
+    confidence_score: Optional[float] = None
+    last_prediction: Optional[datetime] = None
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Risk Prediction Schemas
 class RiskPredictionCreate(BaseModel):
@@ -42,56 +48,42 @@ class RiskPredictionCreate(BaseModel):
 class RiskPrediction(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     customer_id: UUID
-    risk_level: str  # "Low", "Medium", or "High"
+    risk_level: RiskLevel
     confidence_score: Optional[float] = None
     prediction_timestamp: datetime = Field(default_factory=datetime.utcnow)
     
-    class Config:
-        orm_mode = True
-        
-    @validator('risk_level')
-    def validate_risk_level(cls, v):
-        allowed_values = ["Low", "Medium", "High"]
-        if v not in allowed_values:
-            raise ValueError(f"risk_level must be one of {allowed_values}")
-        return v
+    model_config = ConfigDict(from_attributes=True)
 
 # Mitigation Schemas
 class MitigationCreate(BaseModel):
     customer_id: UUID
-    risk_level: str  # Should be "High" for mitigations
-    mitigation_type: str  # "Flag", "Note", "Action", "Monitor", etc.
+    risk_level: Literal["High"]  # Mitigations only apply to high-risk customers
+    mitigation_type: MitigationType
     description: str
     assigned_to: Optional[str] = None
     due_date: Optional[datetime] = None
     
-    @validator('risk_level')
-    def validate_high_risk(cls, v):
-        if v != "High":
-            raise ValueError("Mitigations can only be applied to high-risk customers")
+    @field_validator('due_date')
+    @classmethod
+    def to_naive_utc(cls, v):
+        # The column stores naive UTC, and asyncpg rejects aware datetimes for it
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
         return v
     
-    @validator('mitigation_type')
-    def validate_mitigation_type(cls, v):
-        allowed_types = ["Flag", "Note", "Action", "Monitor"]
-        if v not in allowed_types:
-            raise ValueError(f"mitigation_type must be one of {allowed_types}")
-        return v
-        
 class Mitigation(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     customer_id: UUID
-    risk_level: str
-    mitigation_type: str
+    risk_level: RiskLevel
+    mitigation_type: MitigationType
     description: str
     assigned_to: Optional[str] = None
     due_date: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
-    status: str = "Pending"  # "Pending", "In Progress", "Completed", "Cancelled"
+    status: MitigationStatus = "Pending"
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Statistics Schema
 class RiskDistribution(BaseModel):
@@ -101,8 +93,10 @@ class RiskDistribution(BaseModel):
     total_customers: int
     last_updated: datetime = Field(default_factory=datetime.utcnow)
     
-    @validator('total_customers')
-    def validate_total(cls, v, values):
+    @field_validator('total_customers')
+    @classmethod
+    def validate_total(cls, v, info: ValidationInfo):
+        values = info.data
         expected_total = sum([
             values.get('low_risk_count', 0),
             values.get('medium_risk_count', 0),
@@ -111,4 +105,10 @@ class RiskDistribution(BaseModel):
         
         if v != expected_total:
             raise ValueError(f"total_customers must equal sum of risk counts ({expected_total})")
-        return v
\ No newline at end of file
+        return v
+
+class PredictionCacheStats(BaseModel):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
\ No newline at end of file
@@ -1,17 +1,29 @@
 from typing import Dict, List, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy import JSON, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, load_only, selectinload
 from uuid import UUID
 from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+import time
 
-from app.db.models import Customer, RiskPredictionRecord, MitigationRecord, CustomerFeatureRecord
+from app.db.models import Customer, RiskPredictionRecord, MitigationRecord, CustomerFeatureRecord, LatestPrediction
+from app.db.queries import mark_latest_predictions_stale, upsert_customer_features
 from app.models.ml_model import risk_model
 
+# Seconds a computed risk distribution is served from memory
+RISK_DISTRIBUTION_TTL = 30
+
+# Cached get_risk_distribution result, with the monotonic time it expires at
+_risk_distribution_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
 class RiskService:
     """Service for handling risk-related business logic."""
     
     @staticmethod
-    def predict_customer_risk(
-        db: Session, 
+    async def predict_customer_risk(
+        db: AsyncSession, 
         customer_id: UUID, 
         features: Dict[str, Any]
     ) -> RiskPredictionRecord:
@@ -26,78 +38,97 @@ class RiskService:
         Returns:
             The created risk prediction record
         """
-        # Check if customer exists
-        customer = db.query(Customer).filter(Customer.id == customer_id).first()
-        if not customer:
-            raise ValueError("Customer not found")
-        
         # Make prediction
-        prediction_result = risk_model.predict(features)
+        prediction_result = await run_in_threadpool(risk_model.predict, features)
         
-        # Save prediction to database
-        db_prediction = RiskPredictionRecord(
-            customer_id=customer_id,
-            risk_level=prediction_result["risk_level"],
-            confidence_score=prediction_result.get("confidence_score")
-        )
-        
-        db.add(db_prediction)
+        # Save prediction to database, reading the stored row back with RETURNING.
+        # The customer foreign key rejects unknown customers, so no lookup is needed
+        try:
+            db_prediction = await db.scalar(
+                insert(RiskPredictionRecord).values(
+                    customer_id=customer_id,
+                    risk_level=prediction_result["risk_level"],
+                    confidence_score=prediction_result.get("confidence_score")
+                ).returning(RiskPredictionRecord)
+            )
+        except IntegrityError:
+            await db.rollback()
+            raise ValueError("Customer not found")
         
         # Store features for future reference
-        for feature_name, feature_value in features.items():
-            if feature_value is not None and isinstance(feature_value, (int, float)):
-                db_feature = CustomerFeatureRecord(
-                    customer_id=customer_id,
-                    feature_name=feature_name,
-                    feature_value=float(feature_value)
-                )
-                db.add(db_feature)
+        numeric_features = {
+            name: value for name, value in features.items()
+            if isinstance(value, (int, float))
+        }
+        await upsert_customer_features(db, customer_id, numeric_features)
         
-        db.commit()
-        db.refresh(db_prediction)
+        await db.commit()
+        mark_latest_predictions_stale()
+        # The new prediction changes the risk distribution
+        RiskService.clear_risk_distribution_cache()
         
         return db_prediction
     
     @staticmethod
-    def get_risk_distribution(db: Session) -> Dict[str, int]:
+    def clear_risk_distribution_cache() -> None:
+        """
+        Drop the cached risk distribution. Besides after predict_customer_risk,
+        this runs after each refresh of the latest-prediction view, which on
+        PostgreSQL lags the write and so may have been cached in between.
+        """
+        global _risk_distribution_cache
+        _risk_distribution_cache = None
+    
+    @staticmethod
+    async def get_risk_distribution(db: AsyncSession) -> Dict[str, Any]:
         """
         Get the distribution of customers across risk categories.
         
+        Results are cached in process for RISK_DISTRIBUTION_TTL seconds and
+        dropped whenever predictions change (see clear_risk_distribution_cache).
+        
         Args:
             db: Database session
             
         Returns:
             Dictionary with counts for each risk level
         """
-        # Get the latest risk level for each customer
-        subquery = db.query(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.risk_level
-        ).distinct(
-            RiskPredictionRecord.customer_id
-        ).order_by(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.prediction_timestamp.desc()
-        ).subquery()
+        global _risk_distribution_cache
+        if _risk_distribution_cache and _risk_distribution_cache[0] > time.monotonic():
+            return dict(_risk_distribution_cache[1])
         
-        # Count customers in each risk category
-        low_risk = db.query(subquery).filter(subquery.c.risk_level == "Low").count()
-        medium_risk = db.query(subquery).filter(subquery.c.risk_level == "Medium").count()
-        high_risk = db.query(subquery).filter(subquery.c.risk_level == "High").count()
+        # Count customers by their latest risk level in one GROUP BY over the
+        # latest-prediction view
+        result = await db.execute(
+            select(
+                LatestPrediction.risk_level,
+                func.count()
+            ).group_by(
+                LatestPrediction.risk_level
+            )
+        )
+        counts = dict(result.all())
+        
+        low_risk = counts.get("Low", 0)
+        medium_risk = counts.get("Medium", 0)
+        high_risk = counts.get("High", 0)
         
-        total_customers = db.query(Customer).count()
+        total_customers = await db.scalar(select(func.count(Customer.id)))
         
-        return {
+        distribution = {
             "low_risk_count": low_risk,
             "medium_risk_count": medium_risk,
             "high_risk_count": high_risk,
             "total_customers": total_customers,
             "last_updated": datetime.utcnow()
         }
+        _risk_distribution_cache = (time.monotonic() + RISK_DISTRIBUTION_TTL, distribution)
+        
+        return dict(distribution)
     
     @staticmethod
-    def get_high_risk_customers(
-        db: Session, 
+    async def get_high_risk_customers(
+        db: AsyncSession, 
         skip: int = 0, 
         limit: int = 100
     ) -> List[Tuple[Customer, RiskPredictionRecord]]:
@@ -110,38 +141,53 @@ class RiskService:
             limit: Maximum number of records to return
             
         Returns:
-            List of (customer, prediction) tuples
+            List of (customer, prediction) tuples, with each customer's
+            features already loaded. Predictions carry only id, risk level,
+            confidence score and timestamp; their customer is the paired one
         """
-        # Subquery to get the latest prediction for each customer
-        latest_predictions = db.query(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.id.label('prediction_id')
-        ).distinct(
-            RiskPredictionRecord.customer_id
-        ).order_by(
-            RiskPredictionRecord.customer_id,
-            RiskPredictionRecord.prediction_timestamp.desc()
+        # Rank each customer's predictions newest first; rank 1 is the latest.
+        # The (customer_id, prediction_timestamp DESC) index supplies this order
+        ranked_predictions = select(
+            RiskPredictionRecord,
+            func.row_number().over(
+                partition_by=RiskPredictionRecord.customer_id,
+                order_by=RiskPredictionRecord.prediction_timestamp.desc()
+            ).label('rn')
         ).subquery()
+        latest_prediction = aliased(RiskPredictionRecord, ranked_predictions)
         
         # Query to get high-risk customers with their predictions
         query = (
-            db.query(Customer, RiskPredictionRecord)
-            .join(latest_predictions, Customer.id == latest_predictions.c.customer_id)
-            .join(
-                RiskPredictionRecord,
-                RiskPredictionRecord.id == latest_predictions.c.prediction_id
+            select(Customer, latest_prediction)
+            .join(latest_prediction, Customer.id == latest_prediction.customer_id)
+            .where(
+                ranked_predictions.c.rn == 1,
+                latest_prediction.risk_level == "High"
             )
-            .filter(RiskPredictionRecord.risk_level == "High")
-            .order_by(RiskPredictionRecord.prediction_timestamp.desc())
+            .order_by(latest_prediction.prediction_timestamp.desc())
             .offset(skip)
             .limit(limit)
+            # Load every returned customer's features in one extra SELECT ... IN
+            # query; lazy loads would cost a query per customer and are not
+            # available on an async session
+            .options(
+                selectinload(Customer.features),
+                load_only(
+                    latest_prediction.id,
+                    latest_prediction.risk_level,
+                    latest_prediction.confidence_score,
+                    latest_prediction.prediction_timestamp,
+                    raiseload=True
+                )
+            )
         )
         
-        return query.all()
+        result = await db.execute(query)
+        return result.all()
     
     @staticmethod
-    def get_pending_mitigations(
-        db: Session, 
+    async def get_pending_mitigations(
+        db: AsyncSession, 
         days_threshold: int = 7
     ) -> List[MitigationRecord]:
         """
@@ -157,19 +203,20 @@ class RiskService:
         due_date_threshold = datetime.utcnow() + timedelta(days=days_threshold)
         
         query = (
-            db.query(MitigationRecord)
-            .filter(
+            select(MitigationRecord)
+            .where(
                 MitigationRecord.status.in_(["Pending", "In Progress"]),
                 MitigationRecord.due_date <= due_date_threshold
             )
             .order_by(MitigationRecord.due_date)
         )
         
-        return query.all()
+        result = await db.scalars(query)
+        return result.all()
     
     @staticmethod
-    def get_customer_risk_history(
-        db: Session, 
+    async def get_customer_risk_history(
+        db: AsyncSession, 
         customer_id: UUID,
         limit: int = 10
     ) -> List[RiskPredictionRecord]:
@@ -182,20 +229,31 @@ class RiskService:
             limit: Maximum number of records to return
             
         Returns:
-            List of risk prediction records
+            List of risk prediction records, carrying only id, risk level,
+            confidence score and timestamp; the customer is the one asked for
         """
         query = (
-            db.query(RiskPredictionRecord)
-            .filter(RiskPredictionRecord.customer_id == customer_id)
+            select(RiskPredictionRecord)
+            .where(RiskPredictionRecord.customer_id == customer_id)
             .order_by(RiskPredictionRecord.prediction_timestamp.desc())
             .limit(limit)
+            # Only the columns a history entry shows; raise rather than lazy
+            # load if anything else is touched
+            .options(load_only(
+                RiskPredictionRecord.id,
+                RiskPredictionRecord.risk_level,
+                RiskPredictionRecord.confidence_score,
+                RiskPredictionRecord.prediction_timestamp,
+                raiseload=True
+            ))
         )
         
-        return query.all()
+        result = await db.scalars(query)
+        return result.all()
     
     @staticmethod
-    def get_customer_features(
-        db: Session, 
+    async def get_customer_features(
+        db: AsyncSession, 
         customer_id: UUID
     ) -> Dict[str, float]:
         """
@@ -208,27 +266,24 @@ class RiskService:
         Returns:
             Dictionary of feature names and values
         """
-        # Get the latest feature value for each feature name
-        features = {}
-        
-        # Group by feature name and get the latest record for each
-        subquery = (
-            db.query(
-                CustomerFeatureRecord.feature_name,
-                CustomerFeatureRecord.feature_value,
-                CustomerFeatureRecord.recorded_at
-            )
-            .filter(CustomerFeatureRecord.customer_id == customer_id)
-            .distinct(CustomerFeatureRecord.feature_name)
-            .order_by(
-                CustomerFeatureRecord.feature_name,
-                CustomerFeatureRecord.recorded_at.desc()
+        # Features are upserted, so there is exactly one current row per
+        # feature name. The database folds them into a single JSON object, so
+        # one value comes back instead of a row per feature
+        if db.get_bind().dialect.name == "postgresql":
+            aggregate = func.jsonb_object_agg
+        else:
+            aggregate = func.json_group_object
+        
+        features = await db.scalar(
+            select(
+                aggregate(
+                    CustomerFeatureRecord.feature_name,
+                    CustomerFeatureRecord.feature_value,
+                    type_=JSON
+                )
+            ).where(
+                CustomerFeatureRecord.customer_id == customer_id
             )
-            .subquery()
         )
         
-        # Execute the query and build the feature dictionary
-        for row in db.query(subquery).all():
-            features[row.feature_name] = row.feature_value
-        
-        return features
\ No newline at end of file
+        return features or {}
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Export the risk model to ONNX for faster inference.
+
+Reads the joblib model at MODEL_PATH and writes an ONNX file next to it (or to
+the given path). Point MODEL_PATH at the .onnx file to serve it with ONNX
+Runtime. Requires the optional skl2onnx and onnxruntime packages.
+"""
+import os
+import sys
+import joblib
+from skl2onnx import to_onnx
+from skl2onnx.common.data_types import FloatTensorType
+
+from app.core.config import settings
+from app.models.ml_model import RiskModel
+
+def convert_model(output_path: str):
+    model_data = joblib.load(settings.MODEL_PATH)
+    if isinstance(model_data, dict) and 'model' in model_data:
+        model, features = model_data['model'], model_data.get('features')
+    else:
+        model, features = model_data, None
+    
+    features = list(features) if features else list(RiskModel.DEFAULT_FEATURES)
+    
+    # Plain probability arrays rather than per-row dicts, so the API can take
+    # the argmax with NumPy
+    options = {id(model): {'zipmap': False}} if hasattr(model, 'predict_proba') else None
+    onnx_model = to_onnx(
+        model,
+        initial_types=[("X", FloatTensorType([None, len(features)]))],
+        options=options,
+        target_opset={'': 17, 'ai.onnx.ml': 3}
+    )
+    
+    # Record the feature order the model expects
+    entry = onnx_model.metadata_props.add()
+    entry.key, entry.value = 'features', ','.join(features)
+    
+    with open(output_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    print(f"Model exported to {output_path}")
+
+if __name__ == "__main__":
+    convert_model(sys.argv[1] if len(sys.argv) > 1 else os.path.splitext(settings.MODEL_PATH)[0] + '.onnx')
\ No newline at end of file
@@ -7,17 +7,34 @@ It creates customers, adds their features, predicts their risk level, and
 creates mitigations for high-risk customers.
 """
 
-import requests
+import asyncio
+import numpy as np
+import httpx
 import random
 import json
-import time
 from datetime import datetime, timedelta
+from functools import partial
 import argparse
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any
 
 # API endpoint base URL
 BASE_URL = "http://localhost:8000/api"
 
+# Factors drawn as whole numbers; the rest get two decimal places
+INTEGER_FACTORS = {"age", "num_transactions", "credit_score"}
+
+# Random generator for all generated values
+RNG = np.random.default_rng()
+
+# Customers created and scored per bulk API call
+BATCH_SIZE = 500
+
+# Upper bound on open connections to the API
+MAX_CONNECTIONS = 64
+
+# Bulk calls score hundreds of customers, so allow well over httpx's 5s default
+REQUEST_TIMEOUT = 60.0
+
 # Customer name generation data
 FIRST_NAMES = [
     "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", 
@@ -37,6 +54,22 @@ LAST_NAMES = [
     "Phillips", "Evans", "Turner", "Torres", "Parker", "Collins", "Edwards", "Stewart"
 ]
 
+# Arrays for vectorized draws of the list fields
+FIRST_NAMES_ARR = np.array(FIRST_NAMES)
+LAST_NAMES_ARR = np.array(LAST_NAMES)
+EMAIL_DOMAINS_ARR = np.array(["example.com", "testmail.com", "company.net", "business.org"])
+
+# Mitigation generation data
+MITIGATION_TYPES_ARR = np.array(["Flag", "Note", "Action", "Monitor"])
+MITIGATION_DESCRIPTIONS_ARR = np.array([
+    "Customer shows high-risk transaction patterns. Manual review required.",
+    "Multiple large transactions detected. Possible fraud risk.",
+    "Irregular account activity detected. Schedule customer verification call.",
+    "Low account balance with high transaction frequency. Monitor for overdrafts.",
+    "Recent credit score decrease. Schedule financial advisory session."
+])
+MITIGATION_ASSIGNEES_ARR = np.array(["Risk Team", "Account Manager", "Fraud Department", "Customer Service", "Financial Advisor"])
+
 # Risk factor ranges
 RISK_FACTORS = {
     "age": {"low": (35, 65), "medium": (25, 34), "high": (18, 24)},
@@ -48,119 +81,224 @@ RISK_FACTORS = {
     "average_transaction_amount": {"low": (10, 200), "medium": (201, 500), "high": (501, 1000)}
 }
 
-def generate_random_name() -> str:
-    """Generate a random full name."""
-    first_name = random.choice(FIRST_NAMES)
-    last_name = random.choice(LAST_NAMES)
-    return f"{first_name} {last_name}"
-
-def generate_email(name: str) -> str:
-    """Generate an email address from a name."""
-    name_parts = name.lower().split()
-    domains = ["example.com", "testmail.com", "company.net", "business.org"]
-    if random.random() < 0.5:
-        username = f"{name_parts[0]}.{name_parts[1]}"
-    else:
-        username = f"{name_parts[0][0]}{name_parts[1]}"
-    
-    return f"{username}@{random.choice(domains)}"
-
-def generate_phone() -> str:
-    """Generate a random phone number."""
-    area_code = random.randint(200, 999)
-    prefix = random.randint(200, 999)
-    line = random.randint(1000, 9999)
-    return f"+1-{area_code}-{prefix}-{line}"
-
-def generate_customer() -> Dict[str, Any]:
-    """Generate a random customer profile."""
-    name = generate_random_name()
-    return {
-        "name": name,
-        "email": generate_email(name),
-        "phone": generate_phone(),
-        "external_id": f"CUST-{random.randint(1000, 9999)}"
-    }
+def uniform_2dp(low: float, high: float, size: int) -> np.ndarray:
+    """Draw uniform floats rounded to 2 decimal places."""
+    return np.round(RNG.uniform(low, high, size=size), 2)
 
-def generate_features(risk_profile: str) -> Dict[str, Any]:
+def build_samplers(risk_profile: str) -> Dict[str, Callable[..., np.ndarray]]:
     """
-    Generate customer features based on risk profile.
-    
-    Args:
-        risk_profile: "low", "medium", or "high" risk profile to generate features for
+    Bind each factor's generator and bounds for a risk profile, so feature
+    generation only calls the samplers with a size.
     """
-    features = {}
+    samplers = {}
     for factor, ranges in RISK_FACTORS.items():
         min_val, max_val = ranges[risk_profile]
         
-        # Generate a value within the range
-        if factor in ["age", "num_transactions", "credit_score"]:
+        if factor in INTEGER_FACTORS:
             # Integer features
-            features[factor] = random.randint(min_val, max_val)
+            samplers[factor] = partial(RNG.integers, min_val, max_val, endpoint=True)
         else:
             # Float features with 2 decimal places
-            features[factor] = round(random.uniform(min_val, max_val), 2)
+            samplers[factor] = partial(uniform_2dp, min_val, max_val)
     
-    return features
+    return samplers
+
+# Feature samplers for each risk profile
+SAMPLERS = {risk_profile: build_samplers(risk_profile) for risk_profile in ("low", "medium", "high")}
 
-def create_customer(customer_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a customer via API call."""
-    response = requests.post(f"{BASE_URL}/customers/", json=customer_data)
+def generate_customers_batch(n: int) -> List[Dict[str, Any]]:
+    """
+    Generate n random customer profiles.
+    
+    Names, email formats and domains, phone numbers and external IDs are each
+    drawn for all customers at once with NumPy.
+    """
+    first_names = RNG.choice(FIRST_NAMES_ARR, size=n).tolist()
+    last_names = RNG.choice(LAST_NAMES_ARR, size=n).tolist()
+    full_usernames = (RNG.random(n) < 0.5).tolist()
+    domains = RNG.choice(EMAIL_DOMAINS_ARR, size=n).tolist()
+    area_codes = RNG.integers(200, 999, size=n, endpoint=True).tolist()
+    prefixes = RNG.integers(200, 999, size=n, endpoint=True).tolist()
+    lines = RNG.integers(1000, 9999, size=n, endpoint=True).tolist()
+    external_ids = RNG.integers(1000, 9999, size=n, endpoint=True).tolist()
+    
+    customers = []
+    for first_name, last_name, full_username, domain, area_code, prefix, line, external_id in zip(
+        first_names, last_names, full_usernames, domains, area_codes, prefixes, lines, external_ids
+    ):
+        first, last = first_name.lower(), last_name.lower()
+        username = f"{first}.{last}" if full_username else f"{first[0]}{last}"
+        customers.append({
+            "name": f"{first_name} {last_name}",
+            "email": f"{username}@{domain}",
+            "phone": f"+1-{area_code}-{prefix}-{line}",
+            "external_id": f"CUST-{external_id}"
+        })
+    
+    return customers
+
+def generate_features_batch(risk_profile: str, n: int) -> List[Dict[str, Any]]:
+    """
+    Generate features for n customers with the same risk profile.
+    
+    Each factor is drawn for all customers at once with NumPy rather than one
+    random call per factor per customer.
+    
+    Args:
+        risk_profile: "low", "medium", or "high" risk profile to generate features for
+        n: Number of customers to generate features for
+    """
+    columns = {factor: sampler(size=n).tolist() for factor, sampler in SAMPLERS[risk_profile].items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+async def create_customers(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    customers_data: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Create a batch of customers with one API call."""
+    async with semaphore:
+        response = await client.post("/customers/bulk", json=customers_data)
     if response.status_code != 200:
-        print(f"Error creating customer: {response.text}")
-        return None
+        print(f"Error creating customers: {response.text}")
+        return []
     return response.json()
 
-def add_features_and_predict(customer_id: str, features_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Add features to a customer and get a risk prediction."""
-    prediction_data = {
-        "customer_id": customer_id,
-        "customer_features": features_data
-    }
-    
-    response = requests.post(f"{BASE_URL}/predictions/predict", json=prediction_data)
+async def add_features_and_predict(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    predictions_data: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Get risk predictions for a batch of customers and their features with one API call."""
+    async with semaphore:
+        response = await client.post("/predictions/predict/batch", json=predictions_data)
     if response.status_code != 200:
         print(f"Error predicting risk: {response.text}")
-        return None
+        return []
     return response.json()
 
-def create_mitigation(customer_id: str) -> Dict[str, Any]:
-    """Create a mitigation measure for a high-risk customer."""
-    mitigation_types = ["Flag", "Note", "Action", "Monitor"]
-    descriptions = [
-        "Customer shows high-risk transaction patterns. Manual review required.",
-        "Multiple large transactions detected. Possible fraud risk.",
-        "Irregular account activity detected. Schedule customer verification call.",
-        "Low account balance with high transaction frequency. Monitor for overdrafts.",
-        "Recent credit score decrease. Schedule financial advisory session."
-    ]
-    
-    assignees = ["Risk Team", "Account Manager", "Fraud Department", "Customer Service", "Financial Advisor"]
+def generate_mitigations_batch(customer_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Generate mitigation measures for a list of high-risk customers.
     
-    # Random due date in the next 30 days
-    due_date = (datetime.now() + timedelta(days=random.randint(1, 30))).isoformat()
+    Types, descriptions, assignees and due dates are each drawn for all
+    customers at once with NumPy.
+    """
+    n = len(customer_ids)
+    mitigation_types = RNG.choice(MITIGATION_TYPES_ARR, size=n).tolist()
+    descriptions = RNG.choice(MITIGATION_DESCRIPTIONS_ARR, size=n).tolist()
+    assignees = RNG.choice(MITIGATION_ASSIGNEES_ARR, size=n).tolist()
     
-    mitigation_data = {
-        "customer_id": customer_id,
-        "risk_level": "High",
-        "mitigation_type": random.choice(mitigation_types),
-        "description": random.choice(descriptions),
-        "assigned_to": random.choice(assignees),
-        "due_date": due_date
-    }
+    # Random due dates in the next 30 days
+    now = datetime.now()
+    due_dates = [
+        (now + timedelta(days=offset)).isoformat()
+        for offset in RNG.integers(1, 30, size=n, endpoint=True).tolist()
+    ]
     
-    response = requests.post(f"{BASE_URL}/mitigations/", json=mitigation_data)
+    return [
+        {
+            "customer_id": customer_id,
+            "risk_level": "High",
+            "mitigation_type": mitigation_type,
+            "description": description,
+            "assigned_to": assigned_to,
+            "due_date": due_date
+        }
+        for customer_id, mitigation_type, description, assigned_to, due_date in zip(
+            customer_ids, mitigation_types, descriptions, assignees, due_dates
+        )
+    ]
+
+async def create_mitigation(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    mitigation_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Create a mitigation measure for a high-risk customer."""
+    async with semaphore:
+        response = await client.post("/mitigations/", json=mitigation_data)
     if response.status_code != 200:
         print(f"Error creating mitigation: {response.text}")
         return None
     return response.json()
 
+async def process_batch(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    risk_levels: List[str]
+) -> List[str]:
+    """
+    Create a batch of customers with features for the given risk profiles and
+    predict their risk.
+    
+    Returns:
+        The IDs of the customers predicted to be high risk
+    """
+    # Create customers
+    created_customers = await create_customers(client, semaphore, generate_customers_batch(len(risk_levels)))
+    if not created_customers:
+        return []
+    
+    # Generate features based on risk profile, one vectorized draw per profile
+    features_by_profile = {
+        risk_level: iter(generate_features_batch(risk_level, risk_levels.count(risk_level)))
+        for risk_level in set(risk_levels)
+    }
+    
+    # Add features and get predictions
+    predictions = await add_features_and_predict(client, semaphore, [
+        {"customer_id": customer["id"], "customer_features": next(features_by_profile[risk_level])}
+        for customer, risk_level in zip(created_customers, risk_levels)
+    ])
+    
+    print(f"Created {len(created_customers)} customers and {len(predictions)} risk predictions")
+    
+    # Track high-risk customers for mitigation
+    return [prediction["customer_id"] for prediction in predictions if prediction["risk_level"] == "High"]
+
+async def post_data(batches: List[List[str]], max_concurrency: int) -> int:
+    """
+    Post all customer batches, then mitigations for the customers predicted to
+    be high risk.
+    
+    Requests are multiplexed over a few HTTP/2 connections where the server
+    supports it, and the semaphore bounds how many are in flight at once.
+    
+    Returns:
+        The number of mitigations created
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(
+        http2=True,
+        base_url=BASE_URL,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        timeout=REQUEST_TIMEOUT
+    ) as client:
+        # The batches are independent, so they are sent concurrently
+        results = await asyncio.gather(*(process_batch(client, semaphore, batch) for batch in batches))
+        high_risk_customers = [customer_id for high_risk_ids in results for customer_id in high_risk_ids]
+        
+        # Create mitigations for high-risk customers
+        if not high_risk_customers:
+            return 0
+        
+        print(f"\nCreating mitigation measures for {len(high_risk_customers)} high-risk customers...")
+        
+        mitigations = await asyncio.gather(*(
+            create_mitigation(client, semaphore, mitigation)
+            for mitigation in generate_mitigations_batch(high_risk_customers)
+        ))
+        return sum(1 for mitigation in mitigations if mitigation)
+
 def main():
     """Main function to generate and post data."""
     parser = argparse.ArgumentParser(description="Generate and post bulk data to Customer Risk Dashboard API")
     parser.add_argument("--count", type=int, default=20, help="Number of customers to generate (default: 20)")
     parser.add_argument("--risk-distribution", type=str, default="40,40,20", 
                         help="Percentage distribution of low,medium,high risk customers (default: 40,40,20)")
+    parser.add_argument("--workers", type=int, default=64,
+                        help="Number of concurrent API requests (default: 64)")
     args = parser.parse_args()
     
     # Parse risk distribution
@@ -180,60 +318,14 @@ def main():
     
     print(f"Generating {total_count} customers with risk distribution: {low_count} low, {medium_count} medium, {high_count} high")
     
-    # Generate and post customers
-    customer_count = {
-        "low": low_count,
-        "medium": medium_count,
-        "high": high_count
-    }
-    
-    mitigations_created = 0
-    high_risk_customers = []
+    # Plan every customer's risk profile up front, shuffled so that each batch
+    # mixes profiles instead of sending all of one level together
+    risk_levels = ["low"] * low_count + ["medium"] * medium_count + ["high"] * high_count
+    random.shuffle(risk_levels)
+    batches = [risk_levels[start:start + BATCH_SIZE] for start in range(0, len(risk_levels), BATCH_SIZE)]
     
-    for risk_level, count in customer_count.items():
-        print(f"\nGenerating {count} {risk_level}-risk customers...")
-        
-        for i in range(count):
-            customer_data = generate_customer()
-            print(f"Creating customer {i+1}/{count}: {customer_data['name']}...")
-            
-            # Create customer
-            created_customer = create_customer(customer_data)
-            if not created_customer:
-                continue
-            
-            customer_id = created_customer["id"]
-            
-            # Generate features based on risk profile
-            features = generate_features(risk_level)
-            print(f"Adding features and predicting risk...")
-            
-            # Add features and get prediction
-            prediction = add_features_and_predict(customer_id, features)
-            if not prediction:
-                continue
-            
-            print(f"Risk prediction: {prediction['risk_level']} with confidence {prediction.get('confidence_score', 'N/A')}")
-            
-            # Track high-risk customers for mitigation
-            if prediction['risk_level'] == "High":
-                high_risk_customers.append(customer_id)
-            
-            # Add a small delay to prevent overwhelming the API
-            time.sleep(0.2)
-    
-    # Create mitigations for high-risk customers
-    if high_risk_customers:
-        print(f"\nCreating mitigation measures for {len(high_risk_customers)} high-risk customers...")
-        
-        for i, customer_id in enumerate(high_risk_customers):
-            print(f"Creating mitigation {i+1}/{len(high_risk_customers)}...")
-            mitigation = create_mitigation(customer_id)
-            if mitigation:
-                mitigations_created += 1
-            
-            # Add a small delay
-            time.sleep(0.2)
+    # Customers are created and scored in batches through the bulk endpoints
+    mitigations_created = asyncio.run(post_data(batches, args.workers))
     
     # Print summary
     print("\n======== Data Generation Summary ========")
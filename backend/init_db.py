@@ -2,7 +2,9 @@ from app.db.models import Base
 from app.db.database import engine
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # Views are mapped for querying but created by their own DDL hooks
+    tables = [t for t in Base.metadata.sorted_tables if not t.info.get("is_view")]
+    Base.metadata.create_all(bind=engine, tables=tables)
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
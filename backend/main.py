@@ -1,5 +1,8 @@
 import uvicorn
 
+# Development server. For multiple workers in production, load the app before
+# forking so the memory-mapped risk model is shared by all workers:
+#   gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 4 --preload
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
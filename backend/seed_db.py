@@ -1,10 +1,16 @@
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+import asyncio
+from sqlalchemy import insert
+from app.db.database import SessionLocal, async_engine, engine
 from app.db.models import Customer, CustomerFeatureRecord, RiskPredictionRecord
+from app.db.queries import refresh_latest_predictions
 from app.models.ml_model import risk_model
+import numpy as np
 import random
+import uuid
 from datetime import datetime, timedelta
 
+rng = np.random.default_rng()
+
 # Sample data
 customer_names = [
     "John Smith", "Emily Johnson", "Michael Williams", "Sarah Brown", 
@@ -14,64 +20,96 @@ customer_names = [
     "Joseph Garcia", "Nicole Robinson", "William Clark", "Megan Lewis"
 ]
 
-def generate_features():
-    """Generate random features for a customer"""
-    return {
-        "age": random.randint(18, 80),
-        "income": round(random.uniform(20000, 150000), 2),
-        "credit_score": random.randint(300, 850),
-        "account_balance": round(random.uniform(0, 50000), 2),
-        "num_transactions": random.randint(1, 200),
-        "transaction_frequency": round(random.uniform(0.5, 30), 2),
-        "average_transaction_amount": round(random.uniform(10, 1000), 2)
+def generate_features_batch(n):
+    """Generate random features for n customers, one vectorized draw per feature"""
+    columns = {
+        "age": rng.integers(18, 80, size=n, endpoint=True),
+        "income": np.round(rng.uniform(20000, 150000, size=n), 2),
+        "credit_score": rng.integers(300, 850, size=n, endpoint=True),
+        "account_balance": np.round(rng.uniform(0, 50000, size=n), 2),
+        "num_transactions": rng.integers(1, 200, size=n, endpoint=True),
+        "transaction_frequency": np.round(rng.uniform(0.5, 30, size=n), 2),
+        "average_transaction_amount": np.round(rng.uniform(10, 1000, size=n), 2)
     }
+    columns = {name: values.tolist() for name, values in columns.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+def copy_rows(db, table_name, rows):
+    """Stream rows into a PostgreSQL table with COPY FROM STDIN (psycopg 3)"""
+    columns = list(rows[0])
+    cursor = db.connection().connection.cursor()
+    with cursor.copy(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row([row[column] for column in columns])
+
+async def refresh_and_dispose():
+    """Refresh the latest-prediction view, then close the async engine's pooled connections"""
+    try:
+        await refresh_latest_predictions()
+    finally:
+        await async_engine.dispose()
 
 def seed_database():
     """Seed the database with sample data"""
-    db = next(get_db())
+    db = SessionLocal()
+    now = datetime.utcnow()
     
     # Create customers
-    customers = []
-    for i, name in enumerate(customer_names):
-        customer = Customer(
-            name=name,
-            email=f"{name.lower().replace(' ', '.')}@example.com",
-            external_id=f"CUST-{1000 + i}",
-            created_at=datetime.utcnow() - timedelta(days=random.randint(1, 365))
-        )
-        db.add(customer)
-        customers.append(customer)
-    
-    db.commit()
+    customers = [
+        {
+            "name": name,
+            "email": f"{name.lower().replace(' ', '.')}@example.com",
+            "external_id": f"CUST-{1000 + i}",
+            "created_at": now - timedelta(days=random.randint(1, 365))
+        }
+        for i, name in enumerate(customer_names)
+    ]
+    # Ids are generated by the database. RETURNING order isn't guaranteed for a
+    # batched insert, so rows are matched back to customers by external_id
+    result = db.execute(insert(Customer).returning(Customer.external_id, Customer.id), customers)
+    ids_by_external_id = dict(result.all())
+    customer_ids = [ids_by_external_id[customer["external_id"]] for customer in customers]
     
     # Add features and risk predictions
-    for customer in customers:
-        # Generate features
-        features = generate_features()
-        
-        # Store features
-        for feature_name, feature_value in features.items():
-            feature_record = CustomerFeatureRecord(
-                customer_id=customer.id,
-                feature_name=feature_name,
-                feature_value=feature_value
-            )
-            db.add(feature_record)
-        
-        # Make risk prediction
-        prediction_result = risk_model.predict(features)
-        
-        # Store prediction
-        prediction = RiskPredictionRecord(
-            customer_id=customer.id,
-            risk_level=prediction_result["risk_level"],
-            confidence_score=prediction_result.get("confidence_score", random.uniform(0.7, 0.95)),
-            prediction_timestamp=datetime.utcnow() - timedelta(days=random.randint(0, 30))
+    customer_features = generate_features_batch(len(customer_ids))
+    prediction_results = risk_model.predict_batch(customer_features)
+    
+    feature_rows = []
+    prediction_rows = []
+    for customer_id, features, prediction_result in zip(customer_ids, customer_features, prediction_results):
+        # Collect features for a single bulk write
+        feature_rows.extend(
+            {
+                "id": uuid.uuid4(),
+                "customer_id": customer_id,
+                "feature_name": feature_name,
+                "feature_value": float(feature_value),
+                "recorded_at": now
+            }
+            for feature_name, feature_value in features.items()
         )
-        db.add(prediction)
+        
+        # Collect prediction
+        prediction_rows.append({
+            "id": uuid.uuid4(),
+            "customer_id": customer_id,
+            "risk_level": prediction_result["risk_level"],
+            "confidence_score": prediction_result.get("confidence_score", random.uniform(0.7, 0.95)),
+            "prediction_timestamp": now - timedelta(days=random.randint(0, 30))
+        })
     
+    # COPY goes through psycopg 3, the default PostgreSQL driver of SQLAlchemy 2.1
+    if db.get_bind().dialect.driver == "psycopg":
+        copy_rows(db, CustomerFeatureRecord.__tablename__, feature_rows)
+        copy_rows(db, RiskPredictionRecord.__tablename__, prediction_rows)
+    else:
+        db.execute(insert(CustomerFeatureRecord), feature_rows)
+        db.execute(insert(RiskPredictionRecord), prediction_rows)
     db.commit()
-    print(f"Database seeded with {len(customers)} customers, their features, and risk predictions")
+    db.close()
+    engine.dispose()
+    asyncio.run(refresh_and_dispose())
+    print(f"Database seeded with {len(customer_ids)} customers, their features, and risk predictions")
 
 if __name__ == "__main__":
     seed_database()
\ No newline at end of file
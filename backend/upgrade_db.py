@@ -0,0 +1,179 @@
+"""
+Upgrade a database created by an earlier version of the models in place.
+
+init_db.py only creates missing tables; it never changes existing ones. Run
+this script once against an existing database after upgrading the code. Each
+step checks the current schema first, so running it again is harmless.
+"""
+from sqlalchemy import Enum, inspect, text
+from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy.schema import AddConstraint, CreateTable
+
+from app.db.database import engine
+from app.db.models import Base, CustomerFeatureRecord
+
+FEATURES_UNIQUE_INDEX = "uq_customer_features_customer_feature"
+
+# Views are mapped for querying but created by their own DDL hooks
+TABLES = [t for t in Base.metadata.sorted_tables if not t.info.get("is_view")]
+
+def drop_latest_prediction_view(connection):
+    """
+    Drop the latest-prediction view so the columns it reads can change; it is
+    recreated from the models once the tables are upgraded.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("DROP MATERIALIZED VIEW IF EXISTS mv_latest_prediction"))
+    else:
+        connection.execute(text("DROP VIEW IF EXISTS mv_latest_prediction"))
+
+def dedupe_customer_features(connection):
+    """
+    Keep only the newest row for each (customer_id, feature_name).
+    
+    Earlier versions inserted a new feature row on every prediction instead of
+    updating the existing one, so duplicates block the unique index below.
+    """
+    result = connection.execute(text(
+        "DELETE FROM customer_features WHERE id IN ("
+        "SELECT id FROM ("
+        "SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY customer_id, feature_name "
+        "ORDER BY recorded_at DESC NULLS LAST, id DESC"
+        ") AS rn FROM customer_features"
+        ") ranked WHERE rn > 1"
+        ")"
+    ))
+    print(f"Removed {result.rowcount} duplicate customer feature rows")
+
+def rebuild_sqlite_tables(connection):
+    """
+    Recreate each SQLite table whose definition differs from the models and
+    copy its rows over.
+    
+    SQLite can't change a column's default or a foreign key's ON DELETE action
+    in place, which the customer id default and the cascading foreign keys
+    need. Expects foreign key enforcement and reference rewriting on rename to
+    be switched off for the connection.
+    """
+    existing = dict(connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).all())
+    for table in TABLES:
+        if table.name not in existing:
+            continue
+        if existing[table.name].strip() == str(CreateTable(table).compile(dialect=connection.dialect)).strip():
+            continue
+        
+        # Index names are global in SQLite, so the old ones go before the new
+        # table creates its own
+        index_names = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"),
+            {"table": table.name}
+        ).scalars().all()
+        for index_name in index_names:
+            connection.execute(text(f'DROP INDEX "{index_name}"'))
+        
+        old_name = f"_old_{table.name}"
+        connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+        table.create(connection)
+        
+        old_columns = {column["name"] for column in inspect(connection).get_columns(old_name)}
+        column_list = ", ".join(column.name for column in table.columns if column.name in old_columns)
+        connection.execute(text(f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {old_name}"))
+        connection.execute(text(f"DROP TABLE {old_name}"))
+        print(f"Rebuilt table {table.name}")
+
+def upgrade_postgresql_tables(connection):
+    """
+    Bring PostgreSQL columns and foreign keys in line with the models: server
+    defaults (the customer id), native enum types and ON DELETE CASCADE.
+    """
+    inspector = inspect(connection)
+    for table in TABLES:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing_columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            existing_column = existing_columns[column.name]
+            
+            if column.server_default is not None and existing_column["default"] is None:
+                default = column.server_default.arg.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET DEFAULT {default}"))
+                print(f"Set default of {table.name}.{column.name}")
+            
+            if isinstance(column.type, Enum) and not isinstance(existing_column["type"], ENUM):
+                column.type.create(connection, checkfirst=True)
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                    f"TYPE {column.type.name} USING {column.name}::text::{column.type.name}"
+                ))
+                print(f"Converted {table.name}.{column.name} to {column.type.name}")
+        
+        stale_foreign_keys = [
+            foreign_key for foreign_key in inspector.get_foreign_keys(table.name)
+            if foreign_key["options"].get("ondelete") != "CASCADE"
+        ]
+        if stale_foreign_keys:
+            for foreign_key in stale_foreign_keys:
+                connection.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {foreign_key['name']}"))
+            for constraint in table.foreign_key_constraints:
+                connection.execute(AddConstraint(constraint))
+            print(f"Recreated foreign keys of {table.name}")
+
+def add_customer_features_unique_index(connection):
+    """
+    Make (customer_id, feature_name) unique, as the feature upsert's
+    ON CONFLICT clause requires.
+    """
+    inspector = inspect(connection)
+    table_name = CustomerFeatureRecord.__tablename__
+    unique_column_sets = [
+        constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)
+    ] + [
+        index["column_names"] for index in inspector.get_indexes(table_name) if index["unique"]
+    ]
+    if ["customer_id", "feature_name"] in unique_column_sets:
+        return
+    
+    connection.execute(text(
+        f"CREATE UNIQUE INDEX {FEATURES_UNIQUE_INDEX} ON {table_name} (customer_id, feature_name)"
+    ))
+    print(f"Created unique index {FEATURES_UNIQUE_INDEX}")
+
+def create_missing_indexes(connection):
+    for table in TABLES:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def upgrade_db():
+    sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as connection:
+        if sqlite:
+            # Both only take effect outside a transaction. Renaming a table
+            # mustn't repoint the other tables' foreign keys at the old copy
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+            connection.commit()
+        
+        try:
+            with connection.begin():
+                drop_latest_prediction_view(connection)
+                dedupe_customer_features(connection)
+                if sqlite:
+                    rebuild_sqlite_tables(connection)
+                else:
+                    upgrade_postgresql_tables(connection)
+                add_customer_features_unique_index(connection)
+                create_missing_indexes(connection)
+                # Creates any missing table, and the view through its DDL hooks
+                Base.metadata.create_all(connection, tables=TABLES)
+        finally:
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
+    
+    print("Database upgraded successfully!")
+
+if __name__ == "__main__":
+    upgrade_db()
\ No newline at end of file
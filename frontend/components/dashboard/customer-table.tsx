@@ -52,6 +52,9 @@ export default function CustomerTable() {
   const [error, setError] = useState<string | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [currentPage, setCurrentPage] = useState(1);
+  // Cursor each visited page was fetched with; the first page has none
+  const [pageCursors, setPageCursors] = useState<(string | undefined)[]>([undefined]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [selectedTab, setSelectedTab] = useState<string>('all');
   
   const itemsPerPage = 10;
@@ -60,12 +63,13 @@ export default function CustomerTable() {
     try {
       setIsLoading(true);
       setError(null);
-      const data = await customersApi.getCustomers({
+      const page = await customersApi.getCustomersPage({
         risk_level: riskLevel,
-        skip: (currentPage - 1) * itemsPerPage,
+        cursor: pageCursors[currentPage - 1],
         limit: itemsPerPage,
       });
-      setCustomers(data);
+      setCustomers(page.items);
+      setNextCursor(page.nextCursor);
     } catch (err: any) {
       setError(err.detail || 'Failed to load customers');
       console.error('Error fetching customers:', err);
@@ -101,13 +105,20 @@ export default function CustomerTable() {
   const handleTabChange = (value: string) => {
     setSelectedTab(value);
     setCurrentPage(1); // Reset to first page on tab change
+    setPageCursors([undefined]);
+    setNextCursor(null);
+  };
+  
+  const handleNextPage = () => {
+    if (!nextCursor) return;
+    setPageCursors((prev) => [...prev.slice(0, currentPage), nextCursor]);
+    setCurrentPage((prev) => prev + 1);
   };
   
   const startIndex = (currentPage - 1) * itemsPerPage;
-  const endIndex = startIndex + itemsPerPage;
   const paginatedCustomers = filteredCustomers;
   
-  const totalPages = Math.ceil(filteredCustomers.length / itemsPerPage);
+  const hasMultiplePages = currentPage > 1 || nextCursor !== null;
   
   return (
     <Card className="w-full">
@@ -266,12 +277,10 @@ export default function CustomerTable() {
           </Table>
         </div>
       </CardContent>
-      {totalPages > 1 && (
+      {hasMultiplePages && (
         <CardFooter className="flex justify-between">
           <div className="text-sm text-muted-foreground">
-            Showing {startIndex + 1}-
-            {Math.min(endIndex, filteredCustomers.length)} of{' '}
-            {filteredCustomers.length} results
+            Showing {startIndex + 1}-{startIndex + customers.length}
           </div>
           <div className="flex items-center space-x-2">
             <Button
@@ -286,10 +295,8 @@ export default function CustomerTable() {
             <Button
               variant="outline"
               size="icon"
-              onClick={() =>
-                setCurrentPage((prev) => Math.min(prev + 1, totalPages))
-              }
-              disabled={currentPage === totalPages || isLoading}
+              onClick={handleNextPage}
+              disabled={!nextCursor || isLoading}
             >
               <ChevronRight className="h-4 w-4" />
               <span className="sr-only">Next page</span>
@@ -84,6 +84,14 @@ interface FetchOptions extends RequestInit {
   params?: Record<string, string>;
 }
 
+/**
+ * A page of a keyset-paginated list, with the cursor for the next page
+ */
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
 /**
  * Base function to make API requests
  */
@@ -91,6 +99,32 @@ async function fetchApi<T>(
   endpoint: string,
   options: FetchOptions = {}
 ): Promise<T> {
+  const response = await fetchResponse(endpoint, options);
+  return await response.json();
+}
+
+/**
+ * Make an API request for a paginated list, reading the next page's cursor
+ * from the X-Next-Cursor response header
+ */
+async function fetchPage<T>(
+  endpoint: string,
+  options: FetchOptions = {}
+): Promise<Page<T>> {
+  const response = await fetchResponse(endpoint, options);
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  };
+}
+
+/**
+ * Send an API request and return the successful response
+ */
+async function fetchResponse(
+  endpoint: string,
+  options: FetchOptions = {}
+): Promise<Response> {
   const { params, ...fetchOptions } = options;
   
   // Build URL with query parameters
@@ -123,7 +157,7 @@ async function fetchApi<T>(
       };
     }
     
-    return await response.json();
+    return response;
   } catch (error) {
     console.error('API request error:', error);
     throw error;
@@ -166,7 +200,7 @@ export const customersApi = {
    */
   getCustomers: async (params?: {
     risk_level?: RiskLevel;
-    skip?: number;
+    cursor?: string;
     limit?: number;
   }): Promise<CustomerWithRisk[]> => {
     return fetchApi<CustomerWithRisk[]>('/customers', {
@@ -174,6 +208,19 @@ export const customersApi = {
     });
   },
   
+  /**
+   * Get a page of customers with their risk levels, and the cursor for the next page
+   */
+  getCustomersPage: async (params?: {
+    risk_level?: RiskLevel;
+    cursor?: string;
+    limit?: number;
+  }): Promise<Page<CustomerWithRisk>> => {
+    return fetchPage<CustomerWithRisk>('/customers', {
+      params: params as Record<string, string>,
+    });
+  },
+  
   /**
    * Get customer details by ID
    */
@@ -200,7 +247,7 @@ export const mitigationsApi = {
   getMitigations: async (params?: {
     customer_id?: string;
     status?: MitigationStatus;
-    skip?: number;
+    cursor?: string;
     limit?: number;
   }): Promise<Mitigation[]> => {
     return fetchApi<Mitigation[]>('/mitigations', {